@@ -1,25 +1,83 @@
 import os
-from typing import Optional, List
+import re
+import logging
+import time
+import asyncio
+import hmac
+import hashlib
+import threading
+from typing import Annotated, Optional, List
 from datetime import datetime, timezone
 
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
-from apscheduler.schedulers.background import BackgroundScheduler
+from fastapi.responses import ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, AfterValidator, WithJsonSchema
+from pydantic.networks import validate_email
+from email_validator import SPECIAL_USE_DOMAIN_NAMES
+from email_validator.rfc_constants import CASE_INSENSITIVE_MAILBOX_NAMES
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+import anyio
 import jwt
 from passlib.context import CryptContext
-import requests
+import httpx
+import orjson
+import xxhash
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from cachetools import TTLCache
 
-from database import db, create_document, get_documents
+from database import db, create_document, create_documents, with_timestamps
 from schemas import User, Product, TrackItem, PricePoint
 
+logger = logging.getLogger(__name__)
+
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
 JWT_ALG = "HS256"
+# Encoded once so signing/verification and the login cache HMAC don't re-encode per call
+JWT_KEY = JWT_SECRET.encode()
+JWT_ALGORITHMS = [JWT_ALG]
+JWT_CACHE_ENABLED = os.getenv("JWT_CACHE_ENABLED", "").lower() in ("1", "true", "yes")
+
+# Short-lived cache of verified tokens: sha256(token) -> (sub, exp)
+_jwt_cache = TTLCache(maxsize=10_000, ttl=5)
+_jwt_cache_lock = threading.Lock()
+
+LOGIN_CACHE_ENABLED = os.getenv("LOGIN_CACHE_ENABLED", "").lower() in ("1", "true", "yes")
+
+# Short-lived cache of successful logins: hmac(email|sha256(password)) -> verified password_hash
+_login_cache = TTLCache(maxsize=5000, ttl=30)
+_login_cache_lock = threading.Lock()
+
+# Argon2id for new hashes; existing bcrypt hashes are upgraded on successful login
+pwd_context = CryptContext(schemes=["argon2", "bcrypt"], default="argon2", deprecated="auto")
+
+# Worker threads for blocking work (password hashing, sync routes)
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 64))
+
+FREE_TIER_TRACK_LIMIT = 5
+
+TELEGRAM_API = "https://api.telegram.org"
+
+# Shared keep-alive pool for outbound calls, opened on startup
+http_client: Optional[httpx.AsyncClient] = None
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+class AuthStateMiddleware:
+    """Stash the raw Authorization header on request.state for get_current_user to decode"""
 
-app = FastAPI(title="Price Tracker API", version="0.2.0")
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    scope.setdefault("state", {})["authorization"] = value.decode("latin-1")
+                    break
+        await self.app(scope, receive, send)
+
+app = FastAPI(title="Price Tracker API", version="0.2.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,44 +86,119 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(AuthStateMiddleware)
 
 # ------------------------- Utility -------------------------
 
 def hash_password(p: str) -> str:
     return pwd_context.hash(p)
 
-def verify_password(p: str, h: str) -> bool:
-    return pwd_context.verify(p, h)
+def _login_cache_key(email: str, password: str) -> bytes:
+    digest = hashlib.sha256(password.encode()).digest()
+    return hmac.new(JWT_KEY, email.encode() + b"|" + digest, "sha256").digest()
+
+async def check_login_password(email: str, password: str, password_hash: str) -> bool:
+    if LOGIN_CACHE_ENABLED:
+        key = _login_cache_key(email, password)
+        with _login_cache_lock:
+            cached = _login_cache.get(key)
+        # Only a hit if the stored hash hasn't changed since it was verified
+        if cached is not None and cached == password_hash:
+            return True
+    # Verification is deliberately slow; keep it off the event loop
+    ok, new_hash = await run_in_threadpool(pwd_context.verify_and_update, password, password_hash)
+    if not ok:
+        return False
+    if new_hash:
+        await db["user"].update_one({"email": email}, {"$set": {"password_hash": new_hash}})
+        password_hash = new_hash
+    if LOGIN_CACHE_ENABLED:
+        with _login_cache_lock:
+            _login_cache[key] = password_hash
+    return True
 
 def create_token(email: str) -> str:
     payload = {"sub": email, "iat": int(datetime.now(timezone.utc).timestamp())}
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
+    return jwt.encode(payload, JWT_KEY, algorithm=JWT_ALG)
 
-def get_current_user(authorization: Optional[str] = Header(None)) -> str:
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing Authorization header")
+async def send_telegram_message(client: httpx.AsyncClient, token: str, chat_id: str, text: str) -> httpx.Response:
+    url = f"{TELEGRAM_API}/bot{token}/sendMessage"
+    return await client.post(url, json={"chat_id": chat_id, "text": text})
+
+def decode_bearer(authorization: str) -> Optional[str]:
+    """Return the token subject for a 'Bearer <jwt>' header value, or None if invalid"""
     try:
         scheme, token = authorization.split(" ", 1)
         if scheme.lower() != "bearer":
             raise ValueError("Invalid scheme")
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
-        return payload.get("sub")
+        if JWT_CACHE_ENABLED:
+            key = hashlib.sha256(token.encode()).digest()
+            with _jwt_cache_lock:
+                cached = _jwt_cache.get(key)
+            # Honour the token's own expiry even if the cache entry is still fresh
+            if cached and (cached[1] is None or cached[1] > time.time()):
+                return cached[0]
+        payload = jwt.decode(token, JWT_KEY, algorithms=JWT_ALGORITHMS)
+        sub = payload.get("sub")
+        # Only successful decodes are cached, never failures
+        if JWT_CACHE_ENABLED and sub:
+            with _jwt_cache_lock:
+                _jwt_cache[key] = (sub, payload.get("exp"))
+        return sub
     except Exception:
+        return None
+
+async def get_current_user(request: Request) -> str:
+    # Decoded lazily on first use and memoized per request, so routes without this
+    # dependency never pay for it. Async so FastAPI doesn't hop to the threadpool
+    state = request.scope.setdefault("state", {})
+    if "user_email" not in state:
+        # Stashed by AuthStateMiddleware; fall back for mounts that bypass it
+        authorization = state.get("authorization") or request.headers.get("authorization")
+        if not authorization:
+            raise HTTPException(status_code=401, detail="Missing Authorization header")
+        state["user_email"] = decode_bearer(authorization)
+    sub = state["user_email"]
+    if not sub:
         raise HTTPException(status_code=401, detail="Invalid token")
+    return sub
 
 # ------------------------- Models -------------------------
 
+# Fast path for plain ASCII addresses: simple dot-atom local part, lowercase LDH domain
+# labels with no "xx--" prefix (IDNA/Punycode rules), alphabetic TLD. These are accepted
+# and returned unchanged by email-validator; anything else goes through the full check.
+_EMAIL_RE = re.compile(
+    r"[A-Za-z0-9_%+-]+(?:\.[A-Za-z0-9_%+-]+)*"
+    r"@(?:(?![a-z0-9-]{2}--)[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}"
+)
+
+def _validate_email_fast(value: str) -> str:
+    local, _, domain = value.rpartition("@")
+    if (
+        _EMAIL_RE.fullmatch(value)
+        and len(value) <= 254
+        and len(local) <= 64
+        # email-validator lowercases role mailboxes like Postmaster@
+        and local.lower() not in CASE_INSENSITIVE_MAILBOX_NAMES
+        and not any(domain == d or domain.endswith("." + d) for d in SPECIAL_USE_DOMAIN_NAMES)
+    ):
+        return value
+    return validate_email(value)[1]
+
+FastEmail = Annotated[str, AfterValidator(_validate_email_fast), WithJsonSchema({"type": "string", "format": "email"})]
+
 class RegisterRequest(BaseModel):
-    email: EmailStr
+    email: FastEmail
     password: str
     name: Optional[str] = None
 
 class LoginRequest(BaseModel):
-    email: EmailStr
+    email: FastEmail
     password: str
 
 class AuthResponse(BaseModel):
-    email: EmailStr
+    email: FastEmail
     name: Optional[str] = None
     token: str
 
@@ -74,7 +207,7 @@ class GoogleAuthRequest(BaseModel):
 
 class CreateTrackRequest(BaseModel):
     url: str
-    target_price: float
+    target_price: float = Field(..., ge=0)
 
 class TelegramConfig(BaseModel):
     token: str
@@ -89,8 +222,11 @@ class ScrapeRequest(BaseModel):
 def read_root():
     return {"message": "Price Tracker API running"}
 
+COLLECTIONS_CACHE_TTL = 5
+_collections_cache = {"at": 0.0, "val": []}
+
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -100,7 +236,11 @@ def test_database():
     }
     try:
         if db is not None:
-            collections = db.list_collection_names()
+            # Health probes hit this constantly; refresh the listing at most every 5s
+            if time.monotonic() - _collections_cache["at"] > COLLECTIONS_CACHE_TTL:
+                _collections_cache["val"] = await db.list_collection_names()
+                _collections_cache["at"] = time.monotonic()
+            collections = _collections_cache["val"]
             response["collections"] = collections[:10]
             response["database"] = "✅ Connected"
         else:
@@ -112,89 +252,123 @@ def test_database():
 # ------------------------- Auth -------------------------
 
 @app.post("/api/auth/register", response_model=AuthResponse)
-def register(req: RegisterRequest):
-    if not db:
+async def register(req: RegisterRequest):
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    if db["user"].find_one({"email": req.email}):
+    # Hashing is deliberately slow; keep it off the event loop
+    password_hash = await run_in_threadpool(hash_password, req.password)
+    user = User(email=req.email, password_hash=password_hash, name=req.name)
+    # One atomic upsert instead of find_one + insert; also closes the concurrent-register race
+    res = await db["user"].update_one({"email": req.email}, {"$setOnInsert": with_timestamps(user)}, upsert=True)
+    if res.upserted_id is None:
         raise HTTPException(status_code=400, detail="Email already registered")
-    user = User(email=req.email, password_hash=hash_password(req.password), name=req.name)
-    create_document("user", user)
     token = create_token(req.email)
     return AuthResponse(email=req.email, name=req.name, token=token)
 
 @app.post("/api/auth/login", response_model=AuthResponse)
-def login(req: LoginRequest):
-    if not db:
+async def login(req: LoginRequest):
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    doc = db["user"].find_one({"email": req.email})
-    if not doc or not doc.get("password_hash") or not verify_password(req.password, doc["password_hash"]):
+    doc = await db["user"].find_one({"email": req.email})
+    if not doc or not doc.get("password_hash"):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if not await check_login_password(req.email, req.password, doc["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = create_token(req.email)
     return AuthResponse(email=req.email, name=doc.get("name"), token=token)
 
 @app.post("/api/auth/google", response_model=AuthResponse)
-def google_auth(req: GoogleAuthRequest):
+async def google_auth(req: GoogleAuthRequest):
     # Demo: accept email directly
     if "@" not in req.token:
         raise HTTPException(status_code=400, detail="Invalid Google token (demo expects an email)")
     email = req.token
-    doc = db["user"].find_one({"email": email}) if db else None
-    if not doc:
-        user = User(email=email, name=email.split("@")[0])
-        create_document("user", user)
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not configured")
+    # Fetch-or-create in a single round-trip
+    user = User(email=email, name=email.split("@")[0])
+    doc = await db["user"].find_one_and_update(
+        {"email": email},
+        {"$setOnInsert": with_timestamps(user)},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
     token = create_token(email)
     return AuthResponse(email=email, name=(doc or {}).get("name"), token=token)
 
 # ------------------------- Tracking -------------------------
 
 @app.post("/api/track")
-def create_track(req: CreateTrackRequest, user_email: str = Depends(get_current_user)):
-    if not db:
+async def create_track(req: CreateTrackRequest, user_email: str = Depends(get_current_user)):
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    count = db["trackitem"].count_documents({"user_email": user_email})
-    if count >= 5:
-        raise HTTPException(status_code=403, detail="Free tier allows up to 5 products")
+    # Validate before reserving a slot so a bad payload can't leak one
     track = TrackItem(user_email=user_email, url=req.url, target_price=req.target_price)
-    _id = create_document("trackitem", track)
+    # Reserve a slot atomically; counters of pre-existing users are seeded by
+    # backfill_track_counts at startup, so a missing field really means no tracks
+    res = await db["user"].find_one_and_update(
+        {"email": user_email, "track_count": {"$not": {"$gte": FREE_TIER_TRACK_LIMIT}}},
+        {"$inc": {"track_count": 1}},
+    )
+    if res is None:
+        raise HTTPException(status_code=403, detail=f"Free tier allows up to {FREE_TIER_TRACK_LIMIT} products")
+    try:
+        _id = await create_document("trackitem", track)
+    except Exception:
+        await db["user"].update_one({"email": user_email}, {"$inc": {"track_count": -1}})
+        raise
     return {"id": _id, "status": "created"}
 
 @app.get("/api/track")
-def list_tracks(user_email: str = Depends(get_current_user)):
-    docs = get_documents("trackitem", {"user_email": user_email}, limit=100)
-    for d in docs:
-        d["id"] = str(d.pop("_id", ""))
+async def list_tracks(user_email: str = Depends(get_current_user)):
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not configured")
+    # Let Mongo stringify _id so rows need no Python-side rewrite
+    docs = await db["trackitem"].aggregate([
+        {"$match": {"user_email": user_email}},
+        {"$limit": 100},
+        {"$addFields": {"id": {"$toString": "$_id"}}},
+        {"$project": {"_id": 0}},
+    ]).to_list(length=100)
     return {"items": docs}
 
 @app.get("/api/pricepoints")
-def get_pricepoints(trackitem_id: str, user_email: str = Depends(get_current_user)):
-    if not db:
+async def get_pricepoints(trackitem_id: str, user_email: str = Depends(get_current_user)):
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
     # Validate ownership
     try:
-        ti = db["trackitem"].find_one({"_id": ObjectId(trackitem_id)})
+        ti = await db["trackitem"].find_one({"_id": ObjectId(trackitem_id)})
     except Exception:
         ti = None
     if not ti or ti.get("user_email") != user_email:
         raise HTTPException(status_code=404, detail="Track item not found")
-    points = db["pricepoint"].find({"trackitem_id": trackitem_id}).sort("recorded_at", -1).limit(50)
-    data = [{"price": p.get("price"), "recorded_at": p.get("recorded_at") } for p in points]
-    return {"items": list(reversed(data))}
+    # Newest 50 via the (trackitem_id, recorded_at desc) index, re-sorted ascending on the server.
+    # Price points are our own writes, so the projected rows go out as-is. Returning the
+    # response directly skips jsonable_encoder, letting orjson encode recorded_at natively
+    points = await db["pricepoint"].aggregate([
+        {"$match": {"trackitem_id": trackitem_id}},
+        {"$sort": {"recorded_at": -1}},
+        {"$limit": 50},
+        {"$sort": {"recorded_at": 1}},
+        {"$project": {"_id": 0, "price": 1, "recorded_at": 1}},
+    ]).to_list(length=50)
+    return ORJSONResponse({"items": points})
 
 # ------------------------- Telegram -------------------------
 
 @app.post("/api/telegram/save")
-def save_telegram(cfg: TelegramConfig, user_email: str = Depends(get_current_user)):
-    if not db:
+async def save_telegram(cfg: TelegramConfig, user_email: str = Depends(get_current_user)):
+    if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    db["user"].update_one({"email": user_email}, {"$set": {"telegram_token": cfg.token, "telegram_chat_id": cfg.chat_id}}, upsert=True)
+    await db["user"].update_one({"email": user_email}, {"$set": {"telegram_token": cfg.token, "telegram_chat_id": cfg.chat_id}}, upsert=True)
     return {"ok": True}
 
 @app.post("/api/telegram/test")
-def test_telegram(cfg: TelegramConfig, user_email: str = Depends(get_current_user)):
+async def test_telegram(cfg: TelegramConfig, user_email: str = Depends(get_current_user)):
     try:
-        url = f"https://api.telegram.org/bot{cfg.token}/sendMessage"
-        resp = requests.post(url, json={"chat_id": cfg.chat_id, "text": "✅ Price Tracker connected!"})
-        ok = resp.ok and resp.json().get("ok")
+        resp = await send_telegram_message(http_client, cfg.token, cfg.chat_id, "✅ Price Tracker connected!")
+        ok = resp.is_success and resp.json().get("ok")
         return {"ok": bool(ok), "status": resp.json()}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -209,56 +383,141 @@ def scrape_price(req: ScrapeRequest):
 
 # ------------------------- Background Jobs -------------------------
 
-def check_prices_job():
-    if not db:
+def price_status_pipeline(trackitem_ids: List[ObjectId]) -> List[dict]:
+    """Set current_price/status on each track item from its latest price point, server-side"""
+    last_price = {"$first": "$last.price"}
+    return [
+        {"$match": {"_id": {"$in": trackitem_ids}}},
+        {"$lookup": {
+            "from": "pricepoint",
+            "let": {"id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$trackitem_id", "$$id"]}}},
+                {"$sort": {"recorded_at": -1}},
+                {"$limit": 1},
+            ],
+            "as": "last",
+        }},
+        # Items without any price point keep their current status
+        {"$match": {"last.0": {"$exists": True}}},
+        {"$project": {
+            "current_price": last_price,
+            "status": {"$cond": [{"$lte": [last_price, "$target_price"]}, "deal", "tracking"]},
+        }},
+        {"$merge": {"into": "trackitem", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ]
+
+async def check_prices_job():
+    if db is None:
         return
-    items = db["trackitem"].find({})
+    # Only pull the fields the check actually reads
+    items = await db["trackitem"].find({}, {"_id": 1, "user_email": 1, "url": 1, "target_price": 1}).to_list(length=None)
+    now = datetime.now(timezone.utc)
+    price_points = []
+    deals = []
     for it in items:
         # Here you'd scrape the price. We'll mock a price that sometimes drops.
-        current_price = 4000.0 if hash(it["url"]) % 3 == 0 else it.get("target_price", 5000) + 500
-        # Save price point
-        pp = PricePoint(trackitem_id=str(it.get("_id")), price=current_price, recorded_at=datetime.now(timezone.utc))
-        try:
-            create_document("pricepoint", pp)
-        except Exception:
-            pass
-        # If deal, notify
+        # xxh3 is stable across processes, unlike the salted built-in hash()
+        current_price = 4000.0 if xxhash.xxh3_64_intdigest(it["url"]) % 3 == 0 else it.get("target_price", 5000) + 500
+        price_points.append(PricePoint(trackitem_id=str(it.get("_id")), price=current_price, recorded_at=now))
         if current_price <= it.get("target_price", 0):
-            user = db["user"].find_one({"email": it.get("user_email")})
-            token = (user or {}).get("telegram_token")
-            chat_id = (user or {}).get("telegram_chat_id")
-            if token and chat_id:
-                try:
-                    url = f"https://api.telegram.org/bot{token}/sendMessage"
-                    text = f"🔥 Deal found! {it['url']} now {current_price} SEK (target {it['target_price']} SEK)"
-                    requests.post(url, json={"chat_id": chat_id, "text": text}, timeout=5)
-                except Exception:
-                    pass
-            db["trackitem"].update_one({"_id": it["_id"]}, {"$set": {"status": "deal", "current_price": current_price}})
-        else:
-            db["trackitem"].update_one({"_id": it["_id"]}, {"$set": {"status": "tracking", "current_price": current_price}})
-
-scheduler = BackgroundScheduler()
+            deals.append((it, current_price))
+    # Telegram configs for deal owners only, in one query and indexed by email
+    users_by_email = {}
+    if deals:
+        emails = {it.get("user_email") for it, _ in deals}
+        users = await db["user"].find(
+            {"email": {"$in": list(emails)}},
+            {"email": 1, "telegram_token": 1, "telegram_chat_id": 1},
+        ).to_list(length=None)
+        users_by_email = {u["email"]: u for u in users}
+    notifications = []
+    for it, current_price in deals:
+        user = users_by_email.get(it.get("user_email"))
+        token = (user or {}).get("telegram_token")
+        chat_id = (user or {}).get("telegram_chat_id")
+        if token and chat_id:
+            text = f"🔥 Deal found! {it['url']} now {current_price} SEK (target {it['target_price']} SEK)"
+            notifications.append((token, chat_id, text))
+    # Save price points in one round-trip, then let the server derive status from them
+    try:
+        await create_documents("pricepoint", price_points)
+    except Exception:
+        # Without this tick's points the pipeline would derive status from stale prices
+        logger.exception("Failed to save price points; skipping status update")
+    else:
+        if items:
+            await db["trackitem"].aggregate(price_status_pipeline([it["_id"] for it in items])).to_list(length=None)
+    if notifications:
+        sends = [send_telegram_message(http_client, *n) for n in notifications]
+        await asyncio.gather(*sends, return_exceptions=True)
+
+# Runs on the FastAPI event loop; started in startup_event once the loop exists
+scheduler = AsyncIOScheduler()
 scheduler.add_job(check_prices_job, 'interval', minutes=30, id='price-check')
-scheduler.start()
+
+async def backfill_track_counts():
+    """Seed user.track_count from existing trackitems for users that predate the counter"""
+    if await db["user"].find_one({"track_count": {"$exists": False}}, {"_id": 1}) is None:
+        return
+    counts = await db["trackitem"].aggregate([
+        {"$group": {"_id": "$user_email", "n": {"$sum": 1}}},
+    ]).to_list(length=None)
+    ops = [
+        UpdateOne({"email": c["_id"], "track_count": {"$exists": False}}, {"$set": {"track_count": c["n"]}})
+        for c in counts
+    ]
+    if ops:
+        await db["user"].bulk_write(ops, ordered=False)
+    await db["user"].update_many({"track_count": {"$exists": False}}, {"$set": {"track_count": 0}})
+
+@app.on_event("startup")
+async def startup_event():
+    global http_client
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    http_client = httpx.AsyncClient(timeout=5, limits=httpx.Limits(max_keepalive_connections=100))
+    scheduler.start()
+    if db is not None:
+        # Indexes backing the hot queries; _id is indexed implicitly. Each is attempted on its
+        # own so e.g. pre-existing duplicate emails can't block the others.
+        indexes = [
+            ("user", "email", {"unique": True}),
+            ("trackitem", "user_email", {}),
+            ("pricepoint", [("trackitem_id", 1), ("recorded_at", -1)], {}),
+        ]
+        for collection, keys, options in indexes:
+            try:
+                await db[collection].create_index(keys, **options)
+            except Exception:
+                logger.exception("Failed to create index %s on %s", keys, collection)
+        try:
+            await backfill_track_counts()
+        except Exception:
+            logger.exception("Failed to backfill user track counts")
 
 @app.on_event("shutdown")
-def shutdown_event():
+async def shutdown_event():
     try:
         scheduler.shutdown()
     except Exception:
         pass
+    if http_client is not None:
+        await http_client.aclose()
 
 # ------------------------- Schema Introspection -------------------------
 
+# Schemas are fixed at runtime, so build and serialize them once at import
+SCHEMA_CACHE = {
+    "user": User.model_json_schema(),
+    "product": Product.model_json_schema(),
+    "trackitem": TrackItem.model_json_schema(),
+    "pricepoint": PricePoint.model_json_schema(),
+}
+_SCHEMA_JSON = orjson.dumps(SCHEMA_CACHE)
+
 @app.get("/schema")
 def get_schema():
-    return {
-        "user": User.model_json_schema(),
-        "product": Product.model_json_schema(),
-        "trackitem": TrackItem.model_json_schema(),
-        "pricepoint": PricePoint.model_json_schema(),
-    }
+    return Response(content=_SCHEMA_JSON, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
@@ -14,11 +14,12 @@ class User(BaseModel):
     Collection: "user"
     """
     email: EmailStr = Field(..., description="User email (unique)")
-    password_hash: Optional[str] = Field(None, description="Hashed password (bcrypt)")
+    password_hash: Optional[str] = Field(None, description="Hashed password (argon2 or bcrypt)")
     name: Optional[str] = Field(None, description="Display name")
     telegram_token: Optional[str] = Field(None, description="Telegram Bot Token for this user")
     telegram_chat_id: Optional[str] = Field(None, description="Telegram Chat ID for notifications")
     is_pro: bool = Field(False, description="Pro plan status")
+    track_count: int = Field(0, ge=0, description="Number of track items owned (free tier limit)")
 
 class Product(BaseModel):
     """
@@ -41,6 +42,7 @@ class TrackItem(BaseModel):
     product_id: Optional[str] = Field(None, description="Linked product id (stringified ObjectId)")
     url: str = Field(..., description="Product URL to track")
     target_price: float = Field(..., ge=0, description="Target price in SEK")
+    current_price: Optional[float] = Field(None, description="Latest checked price in SEK")
     status: str = Field("tracking", description="tracking|deal|pending|error")
 
 class PricePoint(BaseModel):